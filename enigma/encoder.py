@@ -1,9 +1,26 @@
-import re
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from functools import lru_cache
+from operator import getitem
+from typing import Iterator
 
-# Don't like running in global, but this allows us to compile it once for
-# performance if we need to test many messages.
-_alphabetic = re.compile(r'^[A-Za-z]+$')
+_ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+# Modulo 26 of small numbers, which is all we need to wrap letter indexes
+# and rotor offsets around the alphabet. Looking it up saves a division.
+_MOD26 = bytes(number % 26 for number in range(3 * 26))
+
+# bytes.translate needs a table for all 256 byte values. Only the first 26
+# are ever used, as we only translate letter indexes.
+_TABLE_PADDING = bytes(256 - 26)
+
+_IDENTITY = bytes(range(26))
+
+# Translates ASCII letters to letter indexes, A being 0 and Z being 25, and
+# back. Lowercase letters get the same index as their uppercase letter, so
+# messages don't need to be converted to uppercase first.
+_LETTER_TO_INDEX = bytes.maketrans(
+    (_ALPHABET + _ALPHABET.lower()).encode('ascii'), _IDENTITY + _IDENTITY)
+_INDEX_TO_LETTER = _ALPHABET.encode('ascii') + _TABLE_PADDING
 
 
 @dataclass
@@ -14,36 +31,161 @@ class RotorInfo:
     notches: list[str]
 
 
-@dataclass
+@lru_cache(maxsize=None)
+def _forward_sequence(sequence: str) -> bytes:
+    """ Converts a rotor's connector sequence to letter indexes. The entry at
+    position i is the index of the letter at that position in the sequence,
+    A being 0 and Z being 25. Lowercase letters get the same index as their
+    uppercase letter.
+    :param sequence: The rotor connection sequence.
+    :raises InvalidRotorError: If the sequence isn't 26 characters long, or
+    contains anything other than alphabet letters a-z.
+    """
+    # The lookup tables that encoding composes from the sequences have an
+    # entry for every letter, so shorter or longer sequences can't be used.
+    if len(sequence) != 26 or not _is_encodable(sequence):
+        raise InvalidRotorError()
+    return bytes(ord(character) - 65 for character in sequence.upper())
+
+
+@lru_cache(maxsize=None)
+def _inverse_sequence(sequence: str) -> bytes:
+    """ Builds the inverse of a rotor's connector sequence. The entry for
+    letter i is the position of that letter in the sequence, A being 0 and Z
+    being 25. Like _forward_sequence, lowercase letters count as their
+    uppercase letter.
+    :param sequence: The rotor connection sequence.
+    :raises InvalidRotorError: If the sequence isn't 26 characters long, or
+    contains anything other than alphabet letters a-z.
+    """
+    forward = _forward_sequence(sequence)
+    inverse = bytearray([len(forward)] * 26)
+    # Walk backwards so that the first occurrence of a letter wins.
+    for index in range(len(forward) - 1, -1, -1):
+        inverse[forward[index]] = index
+    return bytes(inverse)
+
+
+@lru_cache(maxsize=None)
+def _notch_mask(sequence: str, notches: tuple[str, ...]) -> int:
+    """ Builds a bitmask of the rotor offsets at which the rotor is at one of
+    its notches. Bit i is set if the rotor is at a notch at offset i.
+    :param sequence: The rotor connection sequence.
+    :param notches: The characters displayed when the rotor is at a notch.
+    """
+    mask = 0
+    for notch in notches:
+        offset = find_rotor_offset(notch, sequence)
+        if offset >= 0:
+            mask |= 1 << offset
+    return mask
+
+
+@dataclass(frozen=True)
 class RotorSetting:
-    """ Details about the setting of a specific rotor """
+    """ Details about the setting of a specific rotor. Settings can't be
+    changed once they are created, as the tables below are worked out from
+    them. """
     sequence: str
-    notches: list[str]
+    # The notches are kept as a tuple, also when given as a list.
+    notches: tuple[str, ...]
     offset: int
+    # Connector sequence as letter indexes, used on the way to the reflector.
+    forward: bytes = field(init=False, repr=False, compare=False)
+    # Inverse of the connector sequence, used on the way back from the
+    # reflector.
+    inverse: bytes = field(init=False, repr=False, compare=False)
+    # Bitmask of the offsets at which the rotor is at one of its notches.
+    notch_mask: int = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        # An offset of -1 is what find_rotor_offset returns for a letter that
+        # isn't on the rotor. Such a rotor can't be set, so it is rejected
+        # rather than guessing at a position.
+        if not 0 <= self.offset < 26:
+            raise InvalidRotorError()
+        # The setting is frozen, so its fields are set through object.
+        object.__setattr__(self, 'notches', tuple(self.notches))
+        object.__setattr__(self, 'forward', _forward_sequence(self.sequence))
+        object.__setattr__(self, 'inverse', _inverse_sequence(self.sequence))
+        object.__setattr__(
+            self, 'notch_mask', _notch_mask(self.sequence, self.notches))
+
+
+@lru_cache(maxsize=4096)
+def _rotor_setting(sequence: str, notches: tuple[str, ...],
+                   offset: int) -> RotorSetting:
+    """ Returns the setting of a rotor at an offset. Rotor settings can't be
+    changed, so a setting is shared by every enigma setting that has the
+    rotor at that offset, such as those made by EnigmaSetting.with_indicator.
+    :param sequence: The rotor connection sequence.
+    :param notches: The characters displayed when the rotor is at a notch.
+    :param offset: The offset of the rotor.
+    """
+    return RotorSetting(sequence, notches, offset)
 
 
-@dataclass
+@dataclass(frozen=True)
 class EnigmaSetting:
     """
-    Settings to encode an enigma message.
+    Settings to encode an enigma message. Settings can't be changed once
+    they are created, as the tables below are worked out from them; use
+    with_indicator to set the rotors differently.
     """
-    # A list with the rotor's connector sequence, notches and offset
-    rotors: list[RotorSetting]
-    # A list with 2 letter strings, indicating plugboard settings
-    plugs: list[str]
+    # The rotor's connector sequence, notches and offset. Like the plugs,
+    # these are kept as a tuple, also when given as a list.
+    rotors: tuple[RotorSetting, ...]
+    # 2 letter strings, indicating plugboard settings
+    plugs: tuple[str, ...]
     # Connector sequence of the reflector
     reflector: str
+    # Plug board lookup table, for use with bytes.translate on letter
+    # indexes. This and plug_translation are worked out from the plugs when
+    # the setting is created.
+    plug_table: bytes = field(init=False, repr=False, compare=False)
+    # Plug board translation table, for use with str.translate on messages.
+    plug_translation: dict[int, str] = field(
+        init=False, repr=False, compare=False)
+    # Whether any plug connects two different letters. Without plugs, the
+    # plug board tables leave every letter as it is, so they can be skipped.
+    has_plugs: bool = field(init=False, repr=False, compare=False)
+    # The connector sequences, notch masks and offsets of the rotors, each
+    # in their own tuple, leftmost rotor first. Like the plug tables, these
+    # are worked out when the setting is created, so that encoding doesn't
+    # need to collect them from the rotors for every message.
+    sequences: tuple[str, ...] = field(init=False, repr=False, compare=False)
+    notch_masks: tuple[int, ...] = field(
+        init=False, repr=False, compare=False)
+    offsets: tuple[int, ...] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        # The setting is frozen, so its fields are set through object.
+        object.__setattr__(self, 'rotors', tuple(self.rotors))
+        object.__setattr__(self, 'plugs', tuple(self.plugs))
+        plug_table, plug_translation = _plug_tables(self.plugs)
+        object.__setattr__(self, 'plug_table', plug_table)
+        object.__setattr__(self, 'plug_translation', plug_translation)
+        object.__setattr__(
+            self, 'has_plugs', plug_table[:26] != _IDENTITY)
+        object.__setattr__(self, 'sequences', tuple(
+            rotor.sequence for rotor in self.rotors))
+        object.__setattr__(self, 'notch_masks', tuple(
+            rotor.notch_mask for rotor in self.rotors))
+        object.__setattr__(self, 'offsets', tuple(
+            rotor.offset for rotor in self.rotors))
 
     @classmethod
     def with_indicator(cls, setting: 'EnigmaSetting', indicator: str):
         """ Creates a new enigma setting with a different indicator but
-        same rotors and plugs. """
+        same rotors and plugs.
+        :raises InvalidRotorError: If a letter of the indicator is not on its
+        rotor. """
         rotor_settings = list[RotorSetting]()
         rotor_index = 0
         for rotor in setting.rotors:
             offset = find_rotor_offset(indicator[rotor_index], rotor.sequence)
             rotor_settings.append(
-                RotorSetting(rotor.sequence, rotor.notches, offset))
+                _rotor_setting(rotor.sequence, rotor.notches, offset))
             rotor_index += 1
         return EnigmaSetting(rotor_settings, setting.plugs, setting.reflector)
 
@@ -53,11 +195,65 @@ class UnencodableMessageError(ValueError):
     pass
 
 
+class InvalidRotorError(ValueError):
+    """ This error is raised when a rotor or reflector cannot be set up with
+    the provided settings. """
+    pass
+
+
 def _is_encodable(message: str) -> bool:
     """ Checks that message contains only characters that Enigma can handle. """
-    if re.match(_alphabetic, message) is None:
-        return False
-    return True
+    # isalpha also accepts letters outside of A-Z, such as accented letters,
+    # so the message must be ASCII as well. isascii is checked first, as it
+    # doesn't need to scan the string. isalpha is False for empty strings.
+    return message.isascii() and message.isalpha()
+
+
+def _build_plug_table(plugs: list[str]) -> bytes:
+    """ Builds a lookup table for the plugboard. The entry at index i is the
+    index of the letter that letter i is connected to, A being 0 and Z being
+    25. Letters without a plug are connected to themselves.
+    :param plugs: A list with 2 letter strings, indicating plugboard settings.
+    """
+    table = bytearray(range(26))
+    plugged = set()
+    for plug in plugs:
+        if plug is None or len(plug) != 2:
+            continue
+        first, second = ord(plug[0]) - 65, ord(plug[1]) - 65
+        if not (0 <= first < 26 and 0 <= second < 26):
+            continue
+        # When a letter appears in more than one plug, the first plug wins.
+        if first not in plugged:
+            table[first] = second
+            plugged.add(first)
+        if second not in plugged:
+            table[second] = first
+            plugged.add(second)
+    return bytes(table)
+
+
+def _plug_translation(plug_table: bytes) -> dict[int, str]:
+    """ Turns a plug table into a translation table for str.translate, so
+    the plug board can be applied to a whole message in one go.
+    :param plug_table: Lookup table built by _build_plug_table.
+    """
+    return str.maketrans(
+        _ALPHABET, ''.join(chr(index + 65) for index in plug_table))
+
+
+@lru_cache(maxsize=None)
+def _plug_tables(plugs: tuple[str, ...]) -> tuple[bytes, dict[int, str]]:
+    """ Builds the plug board tables of an enigma setting. These are cached,
+    as settings derived from each other, such as those made by
+    EnigmaSetting.with_indicator, all share the same plugs.
+    :param plugs: A tuple with 2 letter strings, indicating plugboard
+    settings.
+    :return: The lookup table for bytes.translate on letter indexes, and the
+    translation table for str.translate on messages.
+    """
+    plug_table = _build_plug_table(plugs)
+    return plug_table + _TABLE_PADDING, _plug_translation(plug_table)
 
 
 def _substitute(message: str, setting: EnigmaSetting) -> str:
@@ -68,17 +264,9 @@ def _substitute(message: str, setting: EnigmaSetting) -> str:
     """
     if message is None:
         return ""
-
-    substituted_message = ""
-    for character in message:
-        for plug in setting.plugs:
-            if plug is None or len(plug) != 2:
-                continue
-            if character in plug:
-                character = plug[1] if character == plug[0] else plug[0]
-                break
-        substituted_message += character
-    return substituted_message
+    if not setting.has_plugs:
+        return message
+    return message.translate(setting.plug_translation)
 
 
 def _char_to_int(character: str):
@@ -94,12 +282,18 @@ def _reverse_encode_rotor(character: str, rotor: RotorSetting) \
     :param rotor: Information about the build and current position of the
     rotor.
     """
-    result = 0
-    for r in rotor.sequence:
-        if r == character:
-            break
-        result += 1
-    return chr(((result - rotor.offset + 26) % 26) + 65)
+    return chr(_reverse_encode_index(_char_to_int(character), rotor) + 65)
+
+
+def _reverse_encode_index(index: int, rotor: RotorSetting) -> int:
+    """
+    Does the same as _reverse_encode_rotor, but on letter indexes rather
+    than characters, A being 0 and Z being 25.
+    :param index: Output letter index to find the input letter index for.
+    :param rotor: Information about the build and current position of the
+    rotor.
+    """
+    return _MOD26[rotor.inverse[index] - rotor.offset + 26]
 
 
 def _advance_rotors(setting: EnigmaSetting) -> EnigmaSetting:
@@ -107,51 +301,215 @@ def _advance_rotors(setting: EnigmaSetting) -> EnigmaSetting:
     always advances. If the notches require it, left rotors also
     advance.
     :param setting: Setting of the enigma machine. """
-    rotate_next_rotor = True
-
-    rotor_infos = []
-    for rotor in setting.rotors[::-1]:
-        # The next rotor should rotate before decoding if its notch is
-        # reached.
-        rotor_offset = rotor.offset
-        if rotate_next_rotor:
-            # If the rotor is at its notch, we'll rotate the next
-            # rotor as well.
-            rotate_next_rotor = False
-            for notch in rotor.notches:
-                if find_rotor_offset(notch, rotor.sequence) == rotor.offset:
-                    rotate_next_rotor = True
-                    break
-            rotor_offset = (rotor.offset + 1) % 26
-
-        rotor_infos.insert(
-            0, RotorSetting(rotor.sequence, rotor.notches, rotor_offset))
+    offsets = list(setting.offsets)
+    _advance_offsets(offsets, setting.notch_masks)
 
+    rotor_infos = [
+        RotorSetting(rotor.sequence, rotor.notches, offset)
+        for rotor, offset in zip(setting.rotors, offsets)]
     return EnigmaSetting(rotor_infos, setting.plugs, setting.reflector)
 
 
+def _advance_offsets(offsets: list[int], notch_masks: tuple[int, ...]):
+    """ Advances rotor offsets in place. The rightmost rotor always advances,
+    and each rotor to its left advances if the rotor to its right was at its
+    notch.
+    :param offsets: Offsets of the rotors, leftmost rotor first.
+    :param notch_masks: Notch masks of the rotors, leftmost rotor first. """
+    carry = 1
+    for index in range(len(offsets) - 1, -1, -1):
+        offset = offsets[index]
+        offsets[index] = (offset + carry) % 26
+        # The next rotor only rotates if this rotor rotated while it was at
+        # its notch.
+        carry &= notch_masks[index] >> offset
+
+
 def _encode_char(character: str, setting: EnigmaSetting):
     """ Encodes a character through the rotors in the Enigma machine,
     then the reflector, then back through the rotors.
     :param character: A character to encode through the Enigma rotor system
     :param setting: Current setting of the enigma machine. """
-    new_char = character
+    return chr(_encode_index(_char_to_int(character), setting) + 65)
 
+
+def _encode_index(index: int, setting: EnigmaSetting) -> int:
+    """ Does the same as _encode_char, but on letter indexes rather than
+    characters, A being 0 and Z being 25.
+    :param index: A letter index to encode through the Enigma rotor system
+    :param setting: Current setting of the enigma machine. """
     # The first rotor is the rightmost rotor. We'll now encode the
     # message through each rotor, using its offset.
-    for rotor in setting.rotors[::-1]:
-        index = (_char_to_int(new_char) + rotor.offset) % 26
-        new_char = rotor.sequence[index]
+    for rotor in reversed(setting.rotors):
+        index = rotor.forward[_MOD26[index + rotor.offset]]
 
     # We then need to reflect the message through the reflector
-    new_char = setting.reflector[_char_to_int(new_char)]
+    index = _forward_sequence(setting.reflector)[index]
 
     # Then we pass the message back through the rotors again, the
     # other way.
     for rotor in setting.rotors:
-        new_char = _reverse_encode_rotor(new_char, rotor)
+        index = _reverse_encode_index(index, rotor)
 
-    return new_char
+    return index
+
+
+@lru_cache(maxsize=None)
+def _rotor_tables(sequence: str, offset: int) -> tuple[bytes, bytes]:
+    """ Builds the translation tables for a signal passing through a rotor,
+    towards the reflector and back. Both tables map letter indexes, A being 0
+    and Z being 25, and can be used with bytes.translate.
+    :param sequence: The rotor connection sequence.
+    :param offset: The current offset of the rotor.
+    """
+    # Rotating the rotor is the same as rotating its sequence.
+    forward = _forward_sequence(sequence)
+    forward = forward[offset:] + forward[:offset]
+    inverse = _inverse_sequence(sequence)
+    backward = bytes(
+        _MOD26[inverse[index] - offset + 26] for index in range(26))
+    return forward + _TABLE_PADDING, backward + _TABLE_PADDING
+
+
+@lru_cache(maxsize=None)
+def _reflector_table(reflector: str) -> bytes:
+    """ Builds the translation table for a signal passing through the
+    reflector, to be used with bytes.translate.
+    :param reflector: Connector sequence of the reflector.
+    """
+    return _forward_sequence(reflector) + _TABLE_PADDING
+
+
+def _compose_lut(sequences: tuple[str, ...], offsets: tuple[int, ...],
+                 reflector: str) -> bytes:
+    """ Composes the rotors and reflector into a single lookup table. For
+    the given rotor positions, the entry at index i is the index of the
+    letter that letter i is encoded into, exactly as _encode_char would.
+    Encoding builds these tables a run at a time, see _rightmost_rotor_luts.
+    :param sequences: Connection sequences of the rotors, leftmost first.
+    :param offsets: Offsets of the rotors, leftmost rotor first.
+    :param reflector: Connector sequence of the reflector. """
+    lut = _IDENTITY
+    for sequence, offset in zip(reversed(sequences), reversed(offsets)):
+        lut = lut.translate(_rotor_tables(sequence, offset)[0])
+
+    lut = lut.translate(_reflector_table(reflector))
+
+    for sequence, offset in zip(sequences, offsets):
+        lut = lut.translate(_rotor_tables(sequence, offset)[1])
+    return lut
+
+
+@lru_cache(maxsize=None)
+def _notch_distances(notch_mask: int) -> bytes:
+    """ Works out, for every offset of a rotor, how many times the rotor can
+    advance before it is at one of its notches. Rotors without notches get 26,
+    a full turn.
+    :param notch_mask: The notch mask of the rotor.
+    """
+    if not notch_mask:
+        return bytes([26] * 26)
+    return bytes(
+        next(distance for distance in range(26)
+             if (notch_mask >> ((offset + distance) % 26)) & 1)
+        for offset in range(26))
+
+
+def _compose_static_half(sequences: tuple[str, ...],
+                         left_offsets: tuple[int, ...],
+                         reflector: str) -> bytes:
+    """ Composes all rotors but the rightmost, and the reflector, into a
+    single translation table. The entry at index i is the index at which a
+    signal leaving the rightmost rotor at index i comes back to it. These
+    rotors stay where they are until the rightmost rotor passes a notch.
+    :param sequences: Connection sequences of the rotors, leftmost first.
+    :param left_offsets: Offsets of all but the rightmost rotor, leftmost
+    first.
+    :param reflector: Connector sequence of the reflector.
+    """
+    return _compose_lut(sequences[:-1], left_offsets, reflector) + \
+        _TABLE_PADDING
+
+
+@lru_cache(maxsize=4096)
+def _rightmost_rotor_luts(sequences: tuple[str, ...],
+                          left_offsets: tuple[int, ...],
+                          reflector: str) -> tuple[bytes, ...]:
+    """ Builds the lookup tables (see _compose_lut) for every offset of the
+    rightmost rotor, while the rotors to its left stay where they are. The
+    tables are repeated once, so that any run of up to 26 offsets can be
+    sliced out without wrapping around.
+    :param sequences: Connection sequences of the rotors, leftmost first.
+    :param left_offsets: Offsets of all but the rightmost rotor, leftmost
+    first.
+    :param reflector: Connector sequence of the reflector.
+    """
+    static_half = _compose_static_half(sequences, left_offsets, reflector)
+    rightmost_sequence = sequences[-1]
+    luts = []
+    for offset in range(26):
+        forward, backward = _rotor_tables(rightmost_sequence, offset)
+        luts.append(forward[:26].translate(static_half).translate(backward))
+    luts = tuple(luts)
+    return luts + luts
+
+
+def _position_luts(setting: EnigmaSetting, length: int) -> list[bytes]:
+    """ Steps the rotors for every position in a message, and returns the
+    lookup table (see _compose_lut) that encodes the letter at each position.
+    :param setting: The settings to use to encode the message.
+    :param length: The length of the message.
+    """
+    if not setting.rotors:
+        return [_compose_lut((), (), setting.reflector)] * length
+
+    sequences = setting.sequences
+    notch_masks = setting.notch_masks
+    offsets = list(setting.offsets)
+    reflector = setting.reflector
+    distances = _notch_distances(notch_masks[-1])
+
+    # The rightmost rotor advances for every letter, but the other rotors
+    # only advance when it passes a notch. We'll take the tables for each run
+    # of letters between notches in one go.
+    luts = []
+    remaining = length
+    while remaining:
+        rightmost_offset = offsets[-1]
+        run = min(distances[rightmost_offset], remaining)
+        if run:
+            run_luts = _rightmost_rotor_luts(
+                sequences, tuple(offsets[:-1]), reflector)
+            luts.extend(
+                run_luts[rightmost_offset + 1:rightmost_offset + 1 + run])
+            rightmost_offset = (rightmost_offset + run) % 26
+            offsets[-1] = rightmost_offset
+            remaining -= run
+
+        # The rightmost rotor is now at a notch, so the next letter also
+        # advances the rotors to its left.
+        if remaining and (notch_masks[-1] >> rightmost_offset) & 1:
+            _advance_offsets(offsets, notch_masks)
+            run_luts = _rightmost_rotor_luts(
+                sequences, tuple(offsets[:-1]), reflector)
+            luts.append(run_luts[offsets[-1]])
+            remaining -= 1
+    return luts
+
+
+def _rotor_encode_indexes(indexes: bytes, setting: EnigmaSetting) -> bytes:
+    """
+    Encodes a message using an enigma machine, working on letter indexes
+    rather than characters, A being 0 and Z being 25.
+    :param indexes: The letter indexes of the message to encode.
+    :param setting: The settings to use to encode the message.
+    """
+    # The rotor positions don't depend on the message, so we'll first work
+    # out the lookup table for every position in the message...
+    luts = _position_luts(setting, len(indexes))
+
+    # ...and then look up all letters in their tables in a single pass.
+    return bytes(map(getitem, luts, indexes))
 
 
 def _rotor_encode(
@@ -164,26 +522,34 @@ def _rotor_encode(
     alphabet letters a-z. Case insensitive.
     :param setting: The settings to use to encode the message.
     """
-    encoded_message = ""
-    for char in message:
-        setting = _advance_rotors(setting)
-        encoded_message += _encode_char(char, setting)
-
-    return encoded_message
+    # Convert the whole message to letter indexes once, rather than
+    # converting every character separately.
+    indexes = message.encode('ascii').translate(_LETTER_TO_INDEX)
+    encoded_indexes = _rotor_encode_indexes(indexes, setting)
+    return encoded_indexes.translate(_INDEX_TO_LETTER).decode('ascii')
+
+
+@lru_cache(maxsize=64)
+def _offset_map(sequence: str) -> dict[str, int]:
+    """ Maps every character of a rotor connection sequence to its position
+    in the sequence, so that find_rotor_offset doesn't have to scan it. Like
+    _forward_sequence, lowercase letters count as their uppercase letter.
+    :param sequence: The rotor connection sequence.
+    """
+    offsets = {}
+    for index, character in enumerate(sequence.upper()):
+        # The first occurrence of a character wins.
+        offsets.setdefault(character, index)
+    return offsets
 
 
 def find_rotor_offset(character: str, sequence: str) -> int:
     """ Finds the rotor offset if the character displayed on the rotor's
-    display is char.
+    display is char. Case insensitive.
     :param character: The character displayed on the rotor
     :param sequence: The rotor connection sequence.
     """
-    index = 0
-    for sequence_char in sequence:
-        if sequence_char == character:
-            return index
-        index += 1
-    return -1
+    return _offset_map(sequence).get(character.upper(), -1)
 
 
 def encode(
@@ -200,11 +566,60 @@ def encode(
     if not _is_encodable(message):
         raise UnencodableMessageError()
 
+    # The whole encoding works on letter indexes rather than characters.
+    indexes = message.encode('ascii').translate(_LETTER_TO_INDEX)
+
     # Route the message through the plug board
-    encoded_message = _substitute(message.upper(), setting)
+    if setting.has_plugs:
+        indexes = indexes.translate(setting.plug_table)
     # Route the message through the rotors
-    encoded_message = _rotor_encode(encoded_message, setting)
+    indexes = _rotor_encode_indexes(indexes, setting)
     # Then back through the plug board.
-    encoded_message = _substitute(encoded_message, setting)
+    if setting.has_plugs:
+        indexes = indexes.translate(setting.plug_table)
+
+    return indexes.translate(_INDEX_TO_LETTER).decode('ascii')
+
+
+def encode_stream(
+        message: str,
+        setting: EnigmaSetting,
+        segment_sizes: list[int]) -> Iterator[str]:
+    """
+    Encodes a message that consists of consecutive segments, such as an
+    indicator followed by the message it is the indicator for. The first
+    segment is encoded using the provided setting, and every next segment
+    using the rotors set to the previous encoded segment. The message is only
+    validated and converted once, rather than once per segment.
+    :param message: The message to encode. This is a string that only contains
+    alphabet letters a-z. Case insensitive.
+    :param setting: The settings to use to encode the first segment.
+    :param segment_sizes: The number of characters in each segment. Together,
+    the segments must cover the whole message.
+    :return: The encoded segments.
+    :raises UnencodableMessageError: If the message contains non-alphabetic
+    characters, or the segments don't add up to the length of the message.
+    """
+    if not _is_encodable(message) or \
+            any(size <= 0 for size in segment_sizes) or \
+            sum(segment_sizes) != len(message):
+        raise UnencodableMessageError()
 
-    return encoded_message
+    # All segments are encoded with the same plugs, so we can route the
+    # whole message through the plug board at once.
+    indexes = message.encode('ascii').translate(_LETTER_TO_INDEX)
+    if setting.has_plugs:
+        indexes = indexes.translate(setting.plug_table)
+
+    start = 0
+    for size in segment_sizes:
+        encoded_indexes = _rotor_encode_indexes(
+            indexes[start:start + size], setting)
+        if setting.has_plugs:
+            encoded_indexes = encoded_indexes.translate(setting.plug_table)
+        encoded_segment = encoded_indexes.translate(
+            _INDEX_TO_LETTER).decode('ascii')
+        yield encoded_segment
+
+        setting = EnigmaSetting.with_indicator(setting, encoded_segment)
+        start += size
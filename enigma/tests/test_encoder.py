@@ -1,3 +1,5 @@
+from dataclasses import FrozenInstanceError
+
 from django.test import TestCase
 
 from enigma import encoder
@@ -28,6 +30,13 @@ class EncoderTestCase(TestCase):
         self.assertFalse(
             encoder._is_encodable(""),
             "An empty string should not be encodable.")
+        self.assertFalse(
+            encoder._is_encodable("ÉCOLE"),
+            "A string containing letters outside of A-Z should not be "
+            "encodable.")
+        self.assertFalse(
+            encoder._is_encodable("AB\n"),
+            "A string ending in a newline should not be encodable.")
 
     def test_substitute(self):
         """ Plugs should switch letters in a string. """
@@ -44,6 +53,26 @@ class EncoderTestCase(TestCase):
         self.assertEqual(
             "", encoder._substitute("", setting),
             "If there is no message, there should be no substitutions.")
+        self.assertTrue(setting.has_plugs)
+        self.assertFalse(
+            blank_setting.has_plugs,
+            "Without plugs, the plug board can be skipped.")
+
+    def test_build_plug_table(self):
+        """ The plug table connects the letters of each plug to each other,
+        and all other letters to themselves. """
+        table = encoder._build_plug_table(["AE", "BQ"])
+        self.assertEqual(26, len(table))
+        self.assertEqual(4, table[0], "A should be connected to E.")
+        self.assertEqual(0, table[4], "E should be connected to A.")
+        self.assertEqual(16, table[1], "B should be connected to Q.")
+        self.assertEqual(2, table[2], "C has no plug, so it stays C.")
+        self.assertEqual(
+            bytes(range(26)), encoder._build_plug_table([None, "A", "ABC"]),
+            "Malformed plugs should be ignored.")
+        self.assertEqual(
+            1, encoder._build_plug_table(["AB", "AC"])[0],
+            "If a letter is in multiple plugs, the first plug is used.")
 
     def test_char_to_int(self):
         """ Char to int should return an index from 0 to 25 for each letter
@@ -107,6 +136,74 @@ class EncoderTestCase(TestCase):
             "If the rotor is rotated to the last position, it should output a "
             "'Z' if the input is 'A'.")
 
+    def test_rotor_sequence(self):
+        """ Rotor sequences are case insensitive, and must consist of 26
+        alphabet letters. """
+        upper = encoder.RotorSetting("EKMFLGDQVZNTOWYHXUSPAIBRCJ", ["Q"], 0)
+        lower = encoder.RotorSetting("ekmflgdqvzntowyhxuspaibrcj", ["Q"], 0)
+        self.assertEqual(upper.forward, lower.forward)
+        self.assertEqual(
+            upper.inverse, lower.inverse,
+            "A lowercase sequence should work like the uppercase sequence.")
+        self.assertEqual(upper.notch_mask, lower.notch_mask)
+        self.assertEqual(
+            upper.notch_mask,
+            encoder.RotorSetting(upper.sequence, ["q"], 0).notch_mask)
+
+        reflector = "YRUHQSLDPXNGOKMIEBFZCWVJAT"
+        upper_setting = encoder.EnigmaSetting.with_indicator(
+            encoder.EnigmaSetting([upper], [], reflector), "E")
+        lower_setting = encoder.EnigmaSetting.with_indicator(
+            encoder.EnigmaSetting([lower], [], reflector), "E")
+        self.assertEqual(upper_setting.offsets, lower_setting.offsets)
+        with self.assertRaises(encoder.InvalidRotorError):
+            encoder.RotorSetting("EKMFLGDQVZNTOWYHXUSPAIBRC1", [], 0)
+
+        # Rotors and reflectors connect all 26 letters.
+        for sequence in ("EKMFLGDQVZNTOWYHXUSPAIBRC",
+                         "EKMFLGDQVZNTOWYHXUSPAIBRCJA"):
+            with self.assertRaises(encoder.InvalidRotorError):
+                encoder.RotorSetting(sequence, [], 0)
+        setting = encoder.EnigmaSetting(
+            rotors=[upper], plugs=[], reflector="YRUHQSLDPXNGOKMIEBFZCWVJA")
+        with self.assertRaises(encoder.InvalidRotorError):
+            encoder.encode("HELLO", setting)
+
+    def test_rotor_offset(self):
+        """ Rotors can only be set to one of their 26 positions. """
+        with self.assertRaises(encoder.InvalidRotorError):
+            encoder.RotorSetting("ABCDEFGHIJKLMNOPQRSTUVWXYZ", [], -1)
+        with self.assertRaises(encoder.InvalidRotorError):
+            encoder.RotorSetting("ABCDEFGHIJKLMNOPQRSTUVWXYZ", [], 26)
+
+        # An indicator letter that isn't on the rotor can't set the rotor.
+        setting = encoder.EnigmaSetting(
+            rotors=[
+                encoder.RotorSetting("ABCDEFGHIJKLMNOPQRSTUVWXYY", ["Y"], 0)
+            ],
+            plugs=[],
+            reflector="ZYXWVUTSRQPONMLKJIHGFEDCBA")
+        with self.assertRaises(encoder.InvalidRotorError):
+            encoder.EnigmaSetting.with_indicator(setting, "Z")
+
+    def test_setting_frozen(self):
+        """ Settings can't be changed after they are created, as encoding
+        uses tables that are worked out from them. """
+        setting = encoder.EnigmaSetting(
+            rotors=[
+                encoder.RotorSetting("EKMFLGDQVZNTOWYHXUSPAIBRCJ", ["Q"], 0)
+            ],
+            plugs=["AB"],
+            reflector="YRUHQSLDPXNGOKMIEBFZCWVJAT")
+        with self.assertRaises(FrozenInstanceError):
+            setting.rotors[0].offset = 5
+        with self.assertRaises(FrozenInstanceError):
+            setting.plugs = ["AB", "CD"]
+        with self.assertRaises(AttributeError):
+            setting.plugs.append("CD")
+        with self.assertRaises(AttributeError):
+            setting.rotors[0].notches.append("E")
+
     def test_advance_rotors(self):
         """ Rightmost rotor should always advance, other rotors should
         advance when the rotor to their right is in its notch position. """
@@ -139,6 +236,24 @@ class EncoderTestCase(TestCase):
             2, setting.rotors[1].offset,
             "Rightmost rotor is now at position 2, as it always advances.")
 
+    def test_advance_offsets(self):
+        """ Advancing offsets in place follows the same rules as
+        _advance_rotors. """
+        left = encoder.RotorSetting("ABCDEFGHIJKLMNOPQRSTUVWXYZ", ["J"], 0)
+        right = encoder.RotorSetting("EKMFLGDQVZNTOWYHXUSPAIBRCJ", ["K"], 0)
+        offsets = [left.offset, right.offset]
+        notch_masks = [left.notch_mask, right.notch_mask]
+
+        encoder._advance_offsets(offsets, notch_masks)
+        self.assertEqual(
+            [0, 1], offsets,
+            "Only the rightmost rotor advances, as it did not hit its notch.")
+
+        encoder._advance_offsets(offsets, notch_masks)
+        self.assertEqual(
+            [1, 2], offsets,
+            "Both rotors advance, as the rightmost rotor hit its notch.")
+
     def test_encode_char(self):
         """ Encode char encodes a character through a provide set of rotor
         settings. """
@@ -172,6 +287,10 @@ class EncoderTestCase(TestCase):
             "The rightmost rotor is offset by one notch, and the reflector "
             "mirrors the letter. Then signal goes offset rotor again, shifting "
             "the letter again, so this should be an 'X'.")
+        self.assertEqual(
+            23, encoder._encode_index(0, setting),
+            "Encoding index 0 should give the index of 'X', like "
+            "_encode_char.")
         self.assertEqual(
             "A", encoder._encode_char("X", setting),
             "Reverse encoding the 'X' should again yield the 'A'.")
@@ -192,6 +311,48 @@ class EncoderTestCase(TestCase):
             "A", encoder._encode_char("X", setting),
             "Reverse encoding the 'X' should again yield the 'A'.")
 
+    def test_compose_lut(self):
+        """ The composed lookup table encodes every letter the same way as
+        _encode_char does. """
+        setting = encoder.EnigmaSetting(
+            rotors=[
+                encoder.RotorSetting("EKMFLGDQVZNTOWYHXUSPAIBRCJ", ["Q"], 3),
+                encoder.RotorSetting("AJDKSIRUXBLHWTMCQGZNPYFVOE", ["E"], 17),
+                encoder.RotorSetting("BDFHJLCPRTXVZNYEIWGAKMUSQO", ["V"], 25)
+            ],
+            plugs=[],
+            reflector="YRUHQSLDPXNGOKMIEBFZCWVJAT")
+        lut = encoder._compose_lut(
+            setting.sequences, setting.offsets, setting.reflector)
+        for character in "ABCDEFGHIJKLMNOPQRSTUVWXYZ":
+            self.assertEqual(
+                encoder._encode_char(character, setting),
+                chr(lut[encoder._char_to_int(character)] + 65),
+                f"The lookup table should encode {character} like "
+                f"_encode_char.")
+
+    def test_position_luts(self):
+        """ The lookup table for every position is the table for the rotors
+        after stepping them as many times. """
+        # The rotors start close to their notches, so that the middle and
+        # left rotors advance within the first few characters.
+        setting = encoder.EnigmaSetting(
+            rotors=[
+                encoder.RotorSetting("EKMFLGDQVZNTOWYHXUSPAIBRCJ", ["Q"], 0),
+                encoder.RotorSetting("AJDKSIRUXBLHWTMCQGZNPYFVOE", ["E"], 24),
+                encoder.RotorSetting("BDFHJLCPRTXVZNYEIWGAKMUSQO", ["V"], 5)
+            ],
+            plugs=[],
+            reflector="YRUHQSLDPXNGOKMIEBFZCWVJAT")
+        luts = encoder._position_luts(setting, 1000)
+        self.assertEqual(1000, len(luts))
+        for lut in luts:
+            setting = encoder._advance_rotors(setting)
+            self.assertEqual(
+                encoder._compose_lut(
+                    setting.sequences, setting.offsets, setting.reflector),
+                lut)
+
     def test_rotor_encode(self):
         """ Rotor encodes advances rotors and encodes chars. """
         setting = encoder.EnigmaSetting(
@@ -215,4 +376,36 @@ class EncoderTestCase(TestCase):
             test_message,
             encoder._rotor_encode("EOPBVFJZCRGSFLGBDUJUQABSBAZSFL", setting),
             "Reversing an encoding with the same settings should return the "
-            "original message.")
\ No newline at end of file
+            "original message.")
+
+    def test_encode_stream(self):
+        """ Every segment is encoded with the rotors set to the previous
+        encoded segment. """
+        setting = encoder.EnigmaSetting(
+            rotors=[
+                encoder.RotorSetting("EKMFLGDQVZNTOWYHXUSPAIBRCJ", ["Q"], 0),
+                encoder.RotorSetting("AJDKSIRUXBLHWTMCQGZNPYFVOE", ["E"], 0),
+                encoder.RotorSetting("BDFHJLCPRTXVZNYEIWGAKMUSQO", ["V"], 0)
+            ],
+            plugs=["AB", "CD"],
+            reflector="YRUHQSLDPXNGOKMIEBFZCWVJAT")
+        message = "ANZBNQHELLOWORLD"
+        first = encoder.encode(message[:3], setting)
+        second = encoder.encode(
+            message[3:6], encoder.EnigmaSetting.with_indicator(setting, first))
+        third = encoder.encode(
+            message[6:], encoder.EnigmaSetting.with_indicator(setting, second))
+        self.assertEqual(
+            [first, second, third],
+            list(encoder.encode_stream(message, setting, [3, 3, 10])))
+
+        with self.assertRaises(encoder.UnencodableMessageError):
+            list(encoder.encode_stream("ANZBNQ", setting, [3, 3, 0]))
+        with self.assertRaises(encoder.UnencodableMessageError):
+            list(encoder.encode_stream("ANZ1NQHELLO", setting, [3, 3, 5]))
+        with self.assertRaises(
+                encoder.UnencodableMessageError,
+                msg="The end of the message should not be dropped."):
+            list(encoder.encode_stream(message, setting, [3, 3, 5]))
+        with self.assertRaises(encoder.UnencodableMessageError):
+            list(encoder.encode_stream(message, setting, [3, 3, 11]))
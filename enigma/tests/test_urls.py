@@ -0,0 +1,25 @@
+import datetime
+
+from django.test import TestCase
+from django.urls import resolve, reverse
+
+from enigma import urls, views
+
+
+class UrlsTestCase(TestCase):
+
+    def test_reverse_date(self):
+        """ Dates in URLs are written as YYYY-MM-DD. """
+        self.assertEqual(
+            '/enigma/decode/ABC/2021-12-19/',
+            reverse(views.decode_view, kwargs={
+                'message': 'ABC', 'date': datetime.date(2021, 12, 19)}))
+
+    def test_resolve_date(self):
+        """ Dates in URLs are passed to the views as dates. """
+        match = resolve('/enigma/decode/ABC/2021-12-19/')
+        self.assertEqual(views.decode_view, match.func)
+        self.assertEqual(datetime.date(2021, 12, 19), match.kwargs['date'])
+        self.assertIs(
+            datetime.date,
+            type(urls.DateConverter().to_python('2021-12-19')))
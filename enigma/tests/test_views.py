@@ -0,0 +1,191 @@
+import datetime
+import threading
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+
+from enigma import views
+
+ROTORS = [
+    {'name': 'I', 'sequence': 'EKMFLGDQVZNTOWYHXUSPAIBRCJ',
+     'notch_set': ['Q']},
+    {'name': 'II', 'sequence': 'AJDKSIRUXBLHWTMCQGZNPYFVOE',
+     'notch_set': ['E']},
+    {'name': 'III', 'sequence': 'BDFHJLCPRTXVZNYEIWGAKMUSQO',
+     'notch_set': ['V']},
+    {'name': 'B', 'sequence': 'YRUHQSLDPXNGOKMIEBFZCWVJAT', 'notch_set': []},
+]
+CODEBOOKS = [{
+    'date': '2021-12-19', 'rotors': ['I', 'II', 'III'],
+    'plug_settings_set': ['AB', 'CD'], 'indicator': 'ABC', 'reflector': 'B'
+}]
+DATE = datetime.date(2021, 12, 19)
+# The tests replace views._session, apart from the one for _session itself.
+_session = views._session
+
+
+class ViewsTestCase(TestCase):
+
+    def setUp(self):
+        """ Every test starts without cached rotors or settings, and with the
+        endpoints returning ROTORS and CODEBOOKS. """
+        cache.clear()
+        views._refresh_rotor_info()
+        self.responses = {
+            views.ROTOR_ENDPOINT: ROTORS,
+            views.CODEBOOK_ENDPOINT.format(date='2021-12-19'): CODEBOOKS,
+        }
+        self.requested = []
+        # Requests for these URLs wait until their event is set.
+        self.stalled = {}
+        patcher = mock.patch.object(
+            views, '_session', return_value=mock.Mock(get=self._get))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(views._refresh_rotor_info)
+
+    def _get(self, url, timeout=None):
+        """ Stands in for the API. """
+        self.assertEqual(views.API_TIMEOUT, timeout)
+        self.requested.append(url)
+        if url in self.stalled:
+            self.stalled[url].wait()
+        response = mock.Mock()
+        response.json.return_value = self.responses[url]
+        return response
+
+    def test_encode_decode_view(self):
+        """ A message encoded by the encode view is decoded by the decode
+        view. """
+        request = RequestFactory().get('/')
+        encoded = views.encode_view(
+            request, 'helloworld', DATE, 'anz', 'bnq').content.decode()
+        self.assertEqual('HPFNVGGZGJMPVCAG', encoded)
+        self.assertEqual(
+            'HELLOWORLD',
+            views.decode_view(request, encoded, DATE).content.decode())
+
+    def test_setting_cached(self):
+        """ The rotors and the codebook are only retrieved once, however
+        often the settings for a date are used. """
+        for _ in range(3):
+            views._get_enigma_setting(DATE)
+        self.assertEqual(1, self.requested.count(views.ROTOR_ENDPOINT))
+        self.assertEqual(2, len(self.requested))
+
+        # The rotors don't change between dates.
+        other_date = datetime.date(2021, 12, 20)
+        self.responses[
+            views.CODEBOOK_ENDPOINT.format(date='2021-12-20')] = CODEBOOKS
+        views._get_enigma_setting(other_date)
+        self.assertEqual(1, self.requested.count(views.ROTOR_ENDPOINT))
+        self.assertEqual(3, len(self.requested))
+
+    def test_fetch_in_parallel_once(self):
+        """ The rotor information is only retrieved on another thread while
+        it isn't cached. """
+        with mock.patch.object(views, '_executor',
+                               wraps=views._executor) as executor:
+            views._get_enigma_setting(DATE)
+            self.assertEqual(1, executor.submit.call_count)
+
+            other_date = datetime.date(2021, 12, 20)
+            self.responses[
+                views.CODEBOOK_ENDPOINT.format(date='2021-12-20')] = CODEBOOKS
+            views._get_enigma_setting(other_date)
+            self.assertEqual(
+                1, executor.submit.call_count,
+                "The rotor information is cached, so no thread is needed.")
+
+    def test_rotor_info_timeout(self):
+        """ A request doesn't wait forever for rotor information that is
+        retrieved on the shared thread, and later requests are answered once
+        the API responds again. """
+        stalled = self.stalled[views.ROTOR_ENDPOINT] = threading.Event()
+        self.addCleanup(stalled.set)
+        with mock.patch.object(views, 'API_TIMEOUT', 0.01):
+            with self.assertRaises(views.RotorInformationNotFoundError):
+                views._get_enigma_setting(DATE)
+        stalled.set()
+        del self.stalled[views.ROTOR_ENDPOINT]
+        self.assertIsNotNone(views._get_enigma_setting(DATE))
+
+    def test_session_per_thread(self):
+        """ Every thread uses its own HTTP session. """
+        session = _session()
+        self.assertIs(session, _session())
+        other_session = views._executor.submit(_session).result()
+        self.assertIsNot(session, other_session)
+        self.assertIs(
+            other_session, views._executor.submit(_session).result(),
+            "The thread that retrieves the rotor information keeps its "
+            "session between requests.")
+
+    def test_refresh_rotor_info(self):
+        """ After refreshing the rotor information, settings are built from
+        the new rotors, even if they were cached. """
+        setting = views._get_enigma_setting(DATE)
+        self.assertEqual(ROTORS[0]['sequence'], setting.rotors[0].sequence)
+
+        new_rotors = [dict(ROTORS[0], sequence=ROTORS[1]['sequence'])]
+        self.responses[views.ROTOR_ENDPOINT] = new_rotors + ROTORS[1:]
+        views._refresh_rotor_info()
+        setting = views._get_enigma_setting(DATE)
+        self.assertEqual(ROTORS[1]['sequence'], setting.rotors[0].sequence)
+        self.assertEqual(2, self.requested.count(views.ROTOR_ENDPOINT))
+
+    def test_invalid_response(self):
+        """ Responses that aren't lists of complete objects raise errors,
+        whether or not they are fully validated. """
+        not_found = {'detail': 'Not found.'}
+        for debug in (False, True):
+            with self.subTest(debug=debug), override_settings(DEBUG=debug):
+                cache.clear()
+                views._refresh_rotor_info()
+                self.responses[views.ROTOR_ENDPOINT] = ROTORS
+                self.responses[views.CODEBOOK_ENDPOINT.format(
+                    date='2021-12-19')] = not_found
+                with self.assertRaises(views.CodebookSettingsInvalidError):
+                    views._get_enigma_setting(DATE)
+
+                self.responses[views.CODEBOOK_ENDPOINT.format(
+                    date='2021-12-19')] = [{'date': '2021-12-19'}]
+                with self.assertRaises(views.CodebookSettingsInvalidError):
+                    views._get_enigma_setting(DATE)
+
+                for name in ('rotors', 'plug_settings_set', 'indicator',
+                             'reflector'):
+                    self.responses[views.CODEBOOK_ENDPOINT.format(
+                        date='2021-12-19')] = [dict(CODEBOOKS[0], **{
+                            name: None})]
+                    with self.assertRaises(views.CodebookSettingsInvalidError):
+                        views._get_enigma_setting(DATE)
+
+                views._refresh_rotor_info()
+                self.responses[views.ROTOR_ENDPOINT] = not_found
+                with self.assertRaises(views.RotorInformationNotFoundError):
+                    views._get_rotor_info()
+
+                self.responses[views.ROTOR_ENDPOINT] = ROTORS[0]
+                with self.assertRaises(views.RotorInformationNotFoundError):
+                    views._get_rotor_info()
+
+                for name in ('sequence', 'notch_set'):
+                    self.responses[views.ROTOR_ENDPOINT] = [
+                        dict(ROTORS[0], **{name: None})]
+                    with self.assertRaises(
+                            views.RotorInformationNotFoundError):
+                        views._get_rotor_info()
+
+    def test_invalid_response_not_cached(self):
+        """ An invalid response isn't cached, so the next request tries
+        again. """
+        self.responses[views.ROTOR_ENDPOINT] = {'detail': 'Not found.'}
+        with self.assertRaises(views.RotorInformationNotFoundError):
+            views._get_enigma_setting(DATE)
+
+        self.responses[views.ROTOR_ENDPOINT] = ROTORS
+        self.assertEqual(
+            ROTORS[0]['sequence'],
+            views._get_enigma_setting(DATE).rotors[0].sequence)
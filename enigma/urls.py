@@ -14,19 +14,28 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 import datetime
+from functools import lru_cache
+
 from django.contrib import admin
 from django.urls import path, register_converter
 
 from . import views
 
+@lru_cache(maxsize=1024)
+def _parse_date(value):
+    """ Parses a date in a URL. Dates repeat a lot between requests, so the
+    parsed dates are cached; strptime is fairly slow. """
+    return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+
+
 class DateConverter:
-    regex = '\d{4}-\d{2}-\d{2}'
+    regex = r'\d{4}-\d{2}-\d{2}'
 
     def to_python(self, value):
-        return datetime.datetime.strptime(value, '%Y-%m-%d')
+        return _parse_date(value)
 
     def to_url(self, value):
-        return value.strftime(value, '%Y-%m-%d')
+        return value.strftime('%Y-%m-%d')
 
 register_converter(DateConverter, 'reverse_date')
 
@@ -1,16 +1,44 @@
 import datetime
-from typing import List, OrderedDict, Dict, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import lru_cache
+from typing import Dict, List, Optional, Union
 
-from django.shortcuts import render
-from django.http import HttpRequest, HttpResponse
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
 
 import requests
+from rest_framework import serializers
 
 from . import encoder
 from .serializers import RotorSerializer, SettingSerializer
 
 ROTOR_ENDPOINT = 'http://localhost:8000/enigma/api/v1/rotors/'
 CODEBOOK_ENDPOINT = 'http://localhost:8000/enigma/api/v1/codes/{date}/'
+# Number of seconds to wait for the API. Rotor information is retrieved on a
+# single shared thread, so a request that never returns would hold up every
+# later request that needs it.
+API_TIMEOUT = 10
+# Number of seconds that the settings for a date are cached.
+CODEBOOK_CACHE_TIMEOUT = 60 * 60
+
+# Settings are built from the rotor information, so settings cached before
+# the rotor information is refreshed are kept under an older version, and
+# no longer used. See _refresh_rotor_info.
+_setting_cache_version = 1
+
+# Both endpoints are on the same server, so reusing connections saves us
+# setting up a new one for every request. Sessions aren't guaranteed to be
+# thread-safe, so every thread gets its own; see _session.
+_local = threading.local()
+
+# Retrieves the rotor information while the codebook is retrieved; see
+# _fetch_enigma_setting. It is shared between requests, so that its thread,
+# and with it the thread's session, is reused.
+_executor = ThreadPoolExecutor(
+    max_workers=1, thread_name_prefix='enigma-rotors')
 
 
 class RotorNotFoundError(ValueError):
@@ -41,25 +69,107 @@ class MultipleCodeBookSettingFoundError(IOError):
     pass
 
 
-def _find_rotor_info(name: str, rotors: List[encoder.RotorInfo]) \
+def _session() -> requests.Session:
+    """ Returns the HTTP session of the current thread, to retrieve data
+    from the API with. """
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = _local.session = requests.Session()
+    return session
+
+
+def _find_rotor_info(
+        name: str,
+        rotors: Union[List[encoder.RotorInfo], Dict[str, encoder.RotorInfo]]) \
         -> encoder.RotorInfo:
     """ Looks through the rotor serializers to.
     :param name: Name of the rotor
-    :param rotors: Build details of all rotors."""
+    :param rotors: Build details of all rotors, either as a list or by name,
+    as made by _rotor_infos_by_name."""
+    if isinstance(rotors, dict):
+        if name in rotors:
+            return rotors[name]
+        raise RotorNotFoundError
     for rotor in rotors:
         if rotor.name == name:
             return rotor
     raise RotorNotFoundError
 
 
+def _rotor_infos_by_name(rotors: List[encoder.RotorInfo]) \
+        -> Dict[str, encoder.RotorInfo]:
+    """ Indexes the build details of rotors by their name, so that they can
+    be looked up without going through the whole list.
+    :param rotors: Build details of all rotors."""
+    result = dict[str, encoder.RotorInfo]()
+    for rotor in rotors:
+        # Like a search through the list, the first rotor with a name wins.
+        result.setdefault(rotor.name, rotor)
+    return result
+
+
+@lru_cache(maxsize=None)
+def _required_fields(serializer_class: type[serializers.Serializer]) \
+        -> dict[str, bool]:
+    """ Looks up the names of the fields that a serializer requires, and
+    whether each of them is a list. All other fields, dates included, are
+    strings in the JSON of the API.
+    :param serializer_class: The serializer to look up the fields of."""
+    return {
+        name: isinstance(field, serializers.ListSerializer)
+        for name, field in serializer_class().fields.items()
+        if field.required}
+
+
+def _is_valid_field(value, is_list: bool) -> bool:
+    """ Checks that a field in a response from the API has the type that
+    its serializer expects, so that a value such as null doesn't get as far
+    as the encoder.
+    :param value: The value of the field.
+    :param is_list: Whether the field is a list of strings, rather than a
+    string."""
+    if is_list:
+        return isinstance(value, list) and all(
+            isinstance(item, str) for item in value)
+    return isinstance(value, str)
+
+
+def _parse_response(response: requests.Response,
+                    serializer_class: type[serializers.Serializer]) \
+        -> Optional[list]:
+    """ Reads the list of objects in a response from the API. The API is
+    part of this app, so it is trusted and responses are only fully
+    validated with the serializer when running in debug mode. Otherwise,
+    only the structure of the response and the types of its fields are
+    checked.
+    :param response: The response from the API.
+    :param serializer_class: Serializer for the objects in the response.
+    :return: The objects in the response, or None if they are invalid."""
+    data = response.json()
+    if not settings.DEBUG:
+        required_fields = _required_fields(serializer_class)
+        if not isinstance(data, list) or not all(
+                isinstance(item, dict) and all(
+                    name in item and _is_valid_field(item[name], is_list)
+                    for name, is_list in required_fields.items())
+                for item in data):
+            return None
+        return data
+    serializer = serializer_class(data=data, many=True)
+    if not serializer.is_valid():
+        return None
+    return serializer.validated_data
+
+
+@lru_cache(maxsize=1)
 def _get_rotor_info() -> list[encoder.RotorInfo]:
-    """ Looks up the rotor information for the specified date"""
+    """ Looks up the rotor information. Rotors don't change, so this is only
+    retrieved once per process; see _refresh_rotor_info."""
     # TODO: Request string is hard coded. Should be configurable.
-    rotor_response = requests.get(ROTOR_ENDPOINT)
-    rotors = RotorSerializer(data=rotor_response.json(), many=True)
+    rotor_response = _session().get(ROTOR_ENDPOINT, timeout=API_TIMEOUT)
+    rotor_data = _parse_response(rotor_response, RotorSerializer)
     result = list[encoder.RotorInfo]()
-    if rotors.is_valid():
-        rotor_data = rotors.validated_data
+    if rotor_data is not None:
         for rotor in rotor_data:
             rotor_info = encoder.RotorInfo(
                 rotor['name'], rotor['sequence'], rotor['notch_set'])
@@ -69,37 +179,87 @@ def _get_rotor_info() -> list[encoder.RotorInfo]:
     raise RotorInformationNotFoundError
 
 
-def _get_enigma_setting(
-        date: datetime.date, rotor_infos: list[encoder.RotorInfo]) \
-        -> encoder.EnigmaSetting:
+def _refresh_rotor_info():
+    """ Forgets the cached rotor information, so that it is retrieved again
+    on the next request. The cached settings are built from the rotor
+    information, so these are forgotten as well. """
+    global _setting_cache_version
+    _get_rotor_info.cache_clear()
+    _setting_cache_version += 1
+
+
+def _get_enigma_setting(date: datetime.date) -> encoder.EnigmaSetting:
+    """
+    Retrieves codebook settings from the code book, or from the cache if
+    they were retrieved recently.
+    :param date: The date for which to retrieve code book settings
+    :return: An EnigmaSetting objects with a machine correctly configured.
+    """
+    cache_key = f'enigma_setting_{date.strftime("%Y-%m-%d")}'
+    version = _setting_cache_version
+    setting = cache.get(cache_key, version=version)
+    if setting is None:
+        setting = _fetch_enigma_setting(date)
+        cache.set(cache_key, setting, CODEBOOK_CACHE_TIMEOUT, version=version)
+    return setting
+
+
+def _fetch_enigma_setting(date: datetime.date) -> encoder.EnigmaSetting:
     """
-    Retrieves codebook settings from the code book.
+    Retrieves codebook settings and rotor information from their endpoints.
+    The two don't depend on each other, so if the rotor information isn't
+    cached yet, it is retrieved at the same time as the codebook settings.
     :param date: The date for which to retrieve code book settings
-    :param rotor_infos:
     :return: An EnigmaSetting objects with a machine correctly configured.
     """
+    if _get_rotor_info.cache_info().currsize:
+        return _build_enigma_setting(_get_codebook(date), _get_rotor_info())
+
+    rotor_infos = _executor.submit(_get_rotor_info)
+    codebook = _get_codebook(date)
+    try:
+        rotor_info = rotor_infos.result(timeout=API_TIMEOUT)
+    except FutureTimeoutError:
+        raise RotorInformationNotFoundError
+    return _build_enigma_setting(codebook, rotor_info)
+
+
+def _get_codebook(date: datetime.date) -> dict:
+    """
+    Retrieves the codebook settings for a date from the code book.
+    :param date: The date for which to retrieve code book settings
+    :return: The validated codebook settings.
+    """
     # Retrieve code book settings
     # TODO: Request string is hard coded. Should be configurable.
     endpoint = CODEBOOK_ENDPOINT.format(date=date.strftime('%Y-%m-%d'))
-    codebook_response = requests.get(endpoint)
-    codebook_json = codebook_response.json()
-    codebooks_serializer = SettingSerializer(data=codebook_json, many=True)
-    if not codebooks_serializer.is_valid():
+    codebook_response = _session().get(endpoint, timeout=API_TIMEOUT)
+    codebooks = _parse_response(codebook_response, SettingSerializer)
+    if codebooks is None:
         raise CodebookSettingsInvalidError
-    codebooks = codebooks_serializer.validated_data
-    if codebooks is None or len(codebooks) == 0:
+    if len(codebooks) == 0:
         raise CodeBookSettingNotFoundError
     if len(codebooks) != 1:
         raise MultipleCodeBookSettingFoundError
-    codebook = codebooks[0]
+    return codebooks[0]
+
 
+def _build_enigma_setting(
+        codebook: dict, rotor_infos: list[encoder.RotorInfo]) \
+        -> encoder.EnigmaSetting:
+    """
+    Configures an enigma machine using the codebook settings.
+    :param codebook: The codebook settings for a date.
+    :param rotor_infos: Build details of all rotors.
+    :return: An EnigmaSetting objects with a machine correctly configured.
+    """
     # We'll now retrieve the rotor data. The setting from the endpoint
     # only contains the name of the rotor, so we'll need to look it
     # up in the rotor_info.
+    rotor_infos_by_name = _rotor_infos_by_name(rotor_infos)
     rotor_settings = list[encoder.RotorSetting]()
-    rotor_index = 0
-    for rotor in codebook['rotors']:
-        rotor_info = _find_rotor_info(rotor, rotor_infos)
+    for rotor_index, rotor in enumerate(codebook['rotors']):
+        rotor_info = _find_rotor_info(rotor, rotor_infos_by_name)
         # Find the offset based on the letter that it displays
         offset = encoder.find_rotor_offset(
             codebook['indicator'][rotor_index], rotor_info.sequence)
@@ -107,8 +267,7 @@ def _get_enigma_setting(
             encoder.RotorSetting(
                 rotor_info.sequence, rotor_info.notches, offset)
         )
-        rotor_index += 1
-    reflector = _find_rotor_info(codebook['reflector'], rotor_infos)
+    reflector = _find_rotor_info(codebook['reflector'], rotor_infos_by_name)
 
     result = encoder.EnigmaSetting(
         rotors=rotor_settings, plugs=codebook['plug_settings_set'],
@@ -122,20 +281,13 @@ def _decode(message: str, setting: encoder.EnigmaSetting) -> str:
     :param message: The message to decode.
     :param setting: Enigma machine setting."""
     rotor_count = len(setting.rotors)
-    # Consume the first prefix and decode using the day indicator.
-
-    # This will decode the message indicator
-    indicator_prefix = encoder.encode(message.upper()[:rotor_count], setting)
-
-    # Consume the second prefix and decode using the first indicator.
-    message_prefix = encoder.encode(
-        message.upper()[rotor_count:2 * rotor_count],
-        encoder.EnigmaSetting.with_indicator(setting, indicator_prefix))
-
-    # Finally, decode the message itself using the message indicator.
-    new_message = encoder.encode(
-        message.upper()[2 * rotor_count:],
-        encoder.EnigmaSetting.with_indicator(setting, message_prefix))
+    # The message starts with the indicator key, encoded using the day
+    # indicator, followed by the message key, encoded using the indicator key.
+    # The rest of the message is encoded using the message key, so each
+    # decoded part sets the rotors for the next one.
+    _, _, new_message = encoder.encode_stream(
+        message, setting,
+        [rotor_count, rotor_count, len(message) - 2 * rotor_count])
     return new_message
 
 
@@ -168,8 +320,7 @@ def _encode(message: str, indicator_indicator: str, message_indicator: str,
 def decode_view(request, message: str, date: datetime.date):
     """ This view decodes a message in the url using the settings of the
     provided date."""
-    rotor_info = _get_rotor_info()
-    setting = _get_enigma_setting(date, rotor_info)
+    setting = _get_enigma_setting(date)
     return HttpResponse(_decode(message, setting))
 
 
@@ -178,7 +329,6 @@ def encode_view(request, message: str, date: datetime.date,
     """ This view encodes a message using the codebook settings on the
     provided date, an indicator to encode the message, and a separate
      indicator te encode the message indicator."""
-    rotor_info = _get_rotor_info()
-    setting = _get_enigma_setting(date, rotor_info)
+    setting = _get_enigma_setting(date)
     return HttpResponse(
         _encode(message, indicator_indicator, message_indicator, setting))